@@ -10,9 +10,17 @@ questions within the same Genie conversation context.
 
 import os
 import sys
+import asyncio
+import hashlib
 import logging
 import traceback
+from dataclasses import replace
+from typing import Optional
+import jinja2
+import orjson
 from aiohttp import web
+from cachetools import TTLCache
+from redis import asyncio as aioredis
 from botbuilder.core import (
     BotFrameworkAdapter,
     BotFrameworkAdapterSettings,
@@ -20,7 +28,15 @@ from botbuilder.core import (
 )
 from botbuilder.schema import Activity, ActivityTypes
 
-from genie_client import GenieClient, GenieResult
+from genie_client import POLL_TIMEOUT, RESULT_PREVIEW_ROWS, GenieClient, GenieResult
+from result_codec import decode_result, encode_result
+
+# uvloop replaces the default selector loop when run as a script (see
+# __main__). Not available on Windows (local dev).
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -42,9 +58,107 @@ ADAPTER = BotFrameworkAdapter(SETTINGS)
 # ---------------------------------------------------------------------------
 genie = GenieClient()
 
-# In-memory map: Teams conversation ID → Genie conversation_id
-# In production, replace with Redis or Azure Table Storage.
-_conv_map: dict[str, str] = {}
+# ---------------------------------------------------------------------------
+# Conversation store: Teams conversation ID → Genie conversation_id
+# ---------------------------------------------------------------------------
+# With REDIS_URL set (e.g. Azure Cache for Redis), the mapping is shared by
+# every Web App instance and survives restarts; entries expire after
+# CONV_TTL_SECONDS of inactivity. Without it, fall back to a bounded
+# in-process TTL cache (fine for a single instance, lost on restart).
+REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+CONV_TTL_SECONDS = 86_400
+CONV_KEY_PREFIX = "genie:conv:"
+CONV_CACHE_MAXSIZE = 10_000
+
+_redis: Optional[aioredis.Redis] = None
+_conv_map: TTLCache = TTLCache(maxsize=CONV_CACHE_MAXSIZE, ttl=CONV_TTL_SECONDS)
+
+
+async def _get_genie_conv(teams_conv_id: str) -> Optional[str]:
+    if _redis is None:
+        return _conv_map.get(teams_conv_id)
+    value = await _redis.get(CONV_KEY_PREFIX + teams_conv_id)
+    return value.decode() if value is not None else None
+
+
+async def _set_genie_conv(teams_conv_id: str, genie_conv_id: str) -> None:
+    if _redis is None:
+        _conv_map[teams_conv_id] = genie_conv_id
+    else:
+        await _redis.set(CONV_KEY_PREFIX + teams_conv_id, genie_conv_id, ex=CONV_TTL_SECONDS)
+
+
+async def _drop_genie_conv(teams_conv_id: str) -> None:
+    if _redis is None:
+        _conv_map.pop(teams_conv_id, None)
+    else:
+        await _redis.delete(CONV_KEY_PREFIX + teams_conv_id)
+
+
+# ---------------------------------------------------------------------------
+# Result cache (Redis only): answers to opening questions, shared by all
+# users for RESULT_TTL_SECONDS. Follow-ups are never cached because their
+# answer depends on the earlier turns. Configure the Redis instance with
+# maxmemory-policy allkeys-lru so hot questions survive memory pressure.
+# ---------------------------------------------------------------------------
+RESULT_TTL_SECONDS = int(os.getenv("RESULT_TTL_SECONDS", "600"))
+RESULT_KEY_PREFIX = "genie:q:"
+
+
+def _result_key(question: str) -> str:
+    digest = hashlib.blake2b(
+        f"{genie.space_id}|{question}".encode(), digest_size=16
+    ).hexdigest()
+    return RESULT_KEY_PREFIX + digest
+
+
+async def _get_cached_result(question: str) -> Optional[GenieResult]:
+    if _redis is None or RESULT_TTL_SECONDS <= 0:
+        return None
+    try:
+        blob = await _redis.get(_result_key(question))
+        return decode_result(blob) if blob is not None else None
+    except Exception as e:
+        logger.warning(f"Result cache read failed: {e}")
+        return None
+
+
+async def _cache_result(question: str, result: GenieResult) -> None:
+    if _redis is None or RESULT_TTL_SECONDS <= 0 or result.status != "COMPLETED":
+        return
+    # Strip the conversation so a cache hit never attaches another user's
+    # thread to the caller; their follow-ups start a fresh conversation.
+    shared = replace(result, conversation_id=None, message_id=None)
+    try:
+        await _redis.set(_result_key(question), encode_result(shared), ex=RESULT_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Result cache write failed: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Single-flight: identical questions asked concurrently in the same thread
+# (double-send, retry after a slow reply) share one Genie call.
+# ---------------------------------------------------------------------------
+# Hard ceiling on a shared call, so a stuck poll cannot wedge later callers.
+ASK_TIMEOUT = POLL_TIMEOUT + 60
+
+_inflight: dict[tuple, asyncio.Task] = {}
+
+
+async def _ask_once(
+    teams_conv_id: str, genie_conv_id: Optional[str], question: str
+) -> GenieResult:
+    key = (teams_conv_id, genie_conv_id, question)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(asyncio.wait_for(
+            genie.ask(question, conversation_id=genie_conv_id), ASK_TIMEOUT
+        ))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one caller going away must not cancel the call for the others
+    return await asyncio.shield(task)
 
 
 # ---------------------------------------------------------------------------
@@ -64,6 +178,24 @@ ADAPTER.on_turn_error = on_error
 # ---------------------------------------------------------------------------
 # Message handler
 # ---------------------------------------------------------------------------
+# Teams hides the typing indicator after a few seconds, so keep re-sending it
+# while Genie works on the answer.
+TYPING_INTERVAL = 2.5   # seconds
+
+
+async def _keep_typing(turn_context: TurnContext, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            await turn_context.send_activity(Activity(type=ActivityTypes.typing))
+        except Exception as e:
+            logger.warning(f"Could not send typing indicator: {e}")
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=TYPING_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
 async def on_message(turn_context: TurnContext):
     if turn_context.activity.type != ActivityTypes.message:
         return
@@ -76,35 +208,61 @@ async def on_message(turn_context: TurnContext):
 
     # Handle reset command
     if user_text.lower() in ("/reset", "/new", "new conversation"):
-        _conv_map.pop(teams_conv_id, None)
+        await _drop_genie_conv(teams_conv_id)
         await turn_context.send_activity("🔄 Started a new Genie conversation.")
         return
 
-    # Send typing indicator
-    await turn_context.send_activity(Activity(type=ActivityTypes.typing))
-
     # Resolve Genie conversation_id (if exists)
-    genie_conv_id = _conv_map.get(teams_conv_id)
-
-    # Query Genie
-    try:
-        result: GenieResult = genie.ask(user_text, conversation_id=genie_conv_id)
-    except Exception as e:
-        logger.error(f"Genie API error: {e}")
-        await turn_context.send_activity(
-            f"⚠️ Genie API error: `{e}`"
-        )
-        return
+    genie_conv_id = await _get_genie_conv(teams_conv_id)
+
+    # Opening questions may be answered straight from the result cache
+    result = None if genie_conv_id else await _get_cached_result(user_text)
+
+    if result is None:
+        # Keep the typing indicator up until Genie answers
+        stop_typing = asyncio.Event()
+        typing_task = asyncio.create_task(_keep_typing(turn_context, stop_typing))
+        try:
+            result = await _ask_once(teams_conv_id, genie_conv_id, user_text)
+        except Exception as e:
+            logger.error(f"Genie API error: {e}")
+            await turn_context.send_activity(
+                f"⚠️ Genie API error: `{e}`"
+            )
+            return
+        finally:
+            stop_typing.set()
+            await typing_task
+        if not genie_conv_id:
+            await _cache_result(user_text, result)
 
     # Store conversation mapping for follow-ups
     if result.conversation_id:
-        _conv_map[teams_conv_id] = result.conversation_id
+        await _set_genie_conv(teams_conv_id, result.conversation_id)
 
     # Format response
     response = _format_response(result)
     await turn_context.send_activity(response)
 
 
+# Reply table, compiled once at import. Cell text must not break the
+# markdown table: the `cell` filter escapes pipes and flattens newlines.
+TABLE_TRANS = str.maketrans({"|": "\\|", "\n": " "})
+_JINJA = jinja2.Environment(autoescape=False, keep_trailing_newline=False)
+_JINJA.filters["cell"] = lambda v: str(v).translate(TABLE_TRANS)
+TABLE_TEMPLATE = _JINJA.from_string(
+    "| {{ col_names | map('cell') | join(' | ') }} |\n"
+    "|{% for _ in col_names %} --- |{% endfor %}"
+    "{% for row in rows %}\n"
+    "| {{ (row.values() if row is mapping else row) | map('cell') | join(' | ') }} |"
+    "{% endfor %}"
+    "{% if total_rows > shown_rows %}\n\n"
+    "*Showing {{ shown_rows }} of {{ total_rows }} rows.*"
+    "{% endif %}"
+)
+SQL_BLOCK = "\n**Generated SQL:**\n```sql\n%s\n```"
+
+
 def _format_response(result: GenieResult) -> str:
     """Format a GenieResult into a Teams-friendly markdown message."""
     if result.status == "FAILED":
@@ -113,36 +271,58 @@ def _format_response(result: GenieResult) -> str:
     if result.status == "TIMEOUT":
         return "⏳ The query is taking too long. Please try a simpler question."
 
-    parts = []
-
-    # Text response
-    if result.text:
-        parts.append(result.text)
-
-    # SQL (collapsed for readability)
-    if result.sql:
-        parts.append(f"\n**Generated SQL:**\n```sql\n{result.sql}\n```")
-
-    # Table (first 20 rows)
-    if result.columns and result.rows:
-        col_names = [c.get("name", f"col_{i}") for i, c in enumerate(result.columns)]
-        header = "| " + " | ".join(col_names) + " |"
-        sep = "| " + " | ".join(["---"] * len(col_names)) + " |"
-        rows_md = []
-        for row in result.rows[:20]:
-            values = row if isinstance(row, list) else list(row.values())
-            rows_md.append("| " + " | ".join(str(v) for v in values) + " |")
-        table = "\n".join([header, sep] + rows_md)
-        if len(result.rows) > 20:
-            table += f"\n\n*Showing 20 of {len(result.rows)} rows.*"
-        parts.append(f"\n{table}")
+    sql_block = SQL_BLOCK % result.sql if result.sql else None
+
+    # Table (preview rows only; the client keeps no more than that)
+    table_block = None
+    preview = result.rows[:RESULT_PREVIEW_ROWS]
+    if result.columns and preview:
+        table_block = "\n" + TABLE_TEMPLATE.render(
+            col_names=[c.get("name", f"col_{i}") for i, c in enumerate(result.columns)],
+            rows=preview,
+            shown_rows=len(preview),
+            total_rows=result.row_count,
+        )
 
+    parts = [p for p in (result.text, sql_block, table_block) if p]
     return "\n\n".join(parts) if parts else "Genie returned an empty response."
 
 
 # ---------------------------------------------------------------------------
 # HTTP server
 # ---------------------------------------------------------------------------
+# Bot Framework activities are a few KB; anything larger is rejected with 413.
+MAX_BODY_BYTES = 64 * 1024
+# Each in-flight /api/messages request holds its slot for the whole Genie
+# round-trip. Up to MAX_BACKLOG more may queue; beyond that we shed load
+# with 503 + Retry-After so Bot Service retries instead of piling up.
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "32"))
+MAX_BACKLOG = int(os.getenv("MAX_BACKLOG", "64"))
+LISTEN_BACKLOG = 1024
+
+_handler_slots = asyncio.Semaphore(MAX_INFLIGHT)
+_waiting = 0
+
+
+@web.middleware
+async def backpressure_middleware(request: web.Request, handler):
+    global _waiting
+    if request.path == "/health":
+        return await handler(request)
+    if _handler_slots.locked() and _waiting >= MAX_BACKLOG:
+        return web.Response(status=503, headers={"Retry-After": "2"})
+
+    _waiting += 1
+    try:
+        await _handler_slots.acquire()
+    finally:
+        _waiting -= 1
+    try:
+        return await handler(request)
+    finally:
+        _handler_slots.release()
+
+
 async def messages(req: web.Request) -> web.Response:
     """Endpoint for Azure Bot Service → this app."""
     if req.content_type == "application/json":
@@ -159,15 +339,46 @@ async def messages(req: web.Request) -> web.Response:
     return web.Response(status=201)
 
 
+# Liveness probes hit this constantly; serve a prebuilt body. add_get also
+# registers HEAD, so HEAD /health works for probes that use it.
+_HEALTH_BYTES = orjson.dumps({"status": "healthy", "service": "my-genie-teams-bot"})
+
+
 async def health(req: web.Request) -> web.Response:
-    return web.json_response({"status": "healthy", "service": "my-genie-teams-bot"})
+    return web.Response(body=_HEALTH_BYTES, content_type="application/json")
+
+
+async def on_startup(app: web.Application):
+    global _redis
+    # The Genie HTTP session and Redis pool must be bound to the running loop.
+    await genie.open()
+    if REDIS_URL:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_MAX_CONNECTIONS,
+        )
+        _redis = aioredis.Redis(connection_pool=pool)
 
 
-app = web.Application()
+async def on_cleanup(app: web.Application):
+    await genie.close()
+    if _redis is not None:
+        await _redis.aclose(close_connection_pool=True)
+
+
+app = web.Application(
+    client_max_size=MAX_BODY_BYTES,
+    middlewares=[backpressure_middleware],
+)
+app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
 app.router.add_post("/api/messages", messages)
 app.router.add_get("/health", health)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "3978"))
     logger.info(f"Starting Acme Genie Teams Bot on port {port}")
-    web.run_app(app, host="0.0.0.0", port=port)
+    # Hand run_app a uvloop loop rather than changing the global loop policy,
+    # so importing this module (e.g. from tests) leaves asyncio untouched.
+    loop = uvloop.new_event_loop() if uvloop is not None else None
+    web.run_app(app, host="0.0.0.0", port=port, backlog=LISTEN_BACKLOG, loop=loop)
@@ -10,11 +10,16 @@ Service Principal OAuth token via environment variables.
 """
 
 import os
-import time
+import asyncio
 import logging
-import requests
+import random
+import aiohttp
+import ijson
+import orjson
 from dataclasses import dataclass, field
-from typing import Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +33,27 @@ GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "")
 POLL_INTERVAL_INITIAL = 1.0     # seconds
 POLL_INTERVAL_MAX = 10.0        # exponential backoff cap
 POLL_TIMEOUT = 300              # 5 minutes max wait
+# Server-side long-poll hint (ms) sent as ?wait_ms= on status polls; 0 = off.
+# If the endpoint answers early without finishing, the client concludes the
+# hint is unsupported and falls back to the backoff schedule above.
+POLL_WAIT_MS = int(os.getenv("GENIE_POLL_WAIT_MS", "0"))
+
+RETRY_MAX_ATTEMPTS = 5          # retries per HTTP call on transient errors
+RETRY_BACKOFF_BASE = 0.5        # seconds
+RETRY_BACKOFF_MAX = 30.0        # backoff cap (Retry-After may exceed it)
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# POSTs start conversations and messages and are not idempotent, so they are
+# only retried when the server cannot have acted on them: throttled or
+# unavailable (honouring Retry-After), or the connection never opened.
+RETRY_STATUSES_POST = frozenset({429, 503})
+
+RESULT_PREVIEW_ROWS = 20        # rows kept in memory per query result
+ATTACHMENT_CONCURRENCY = 8      # parallel query-result fetches per client
+
+HTTP_MAX_CONNECTIONS = 200      # total sockets across all hosts
+HTTP_MAX_PER_HOST = 50          # sockets to the Databricks workspace
+HTTP_KEEPALIVE_TIMEOUT = 75     # seconds an idle socket stays open for reuse
+HTTP_DNS_CACHE_TTL = 300        # seconds
 
 
 @dataclass
@@ -37,14 +63,74 @@ class GenieResult:
     text: Optional[str] = None               # natural-language response
     sql: Optional[str] = None                # generated SQL (if any)
     columns: list = field(default_factory=list)
-    rows: list = field(default_factory=list)
+    rows: list = field(default_factory=list)   # first RESULT_PREVIEW_ROWS rows
+    row_count: int = 0                       # total rows in the query result
     error: Optional[str] = None
     conversation_id: Optional[str] = None
     message_id: Optional[str] = None
 
 
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+async def _read_query_result(resp: aiohttp.ClientResponse) -> dict:
+    """
+    Stream-parse a query-result body. Column metadata is kept in full, but
+    only the first RESULT_PREVIEW_ROWS rows are materialized; the rest are
+    counted as they go by, so wide results never sit in memory as a whole.
+    """
+    columns, rows, row_count = [], [], 0
+    builder = target = None
+    depth = 0
+
+    async for prefix, event, value in ijson.parse_async(resp.content, use_float=True):
+        if builder is None:
+            if prefix == "columns.item":
+                target = columns
+            elif prefix == "rows.item":
+                target = rows if row_count < RESULT_PREVIEW_ROWS else None
+            else:
+                continue
+            builder = ijson.ObjectBuilder() if target is not None else False
+
+        if event in ("start_array", "start_map"):
+            depth += 1
+        elif event in ("end_array", "end_map"):
+            depth -= 1
+        if builder:
+            builder.event(event, value)
+        if depth == 0 and event != "map_key":
+            if target is not None:
+                target.append(builder.value)
+            if target is not columns:
+                row_count += 1
+            builder = None
+
+    return {"columns": columns, "rows": rows, "row_count": row_count}
+
+
 class GenieClient:
-    """Thin client around the Genie Conversation API (v2.0)."""
+    """
+    Thin async client around the Genie Conversation API (v2.0).
+
+    The underlying aiohttp session must be created from inside the running
+    event loop, so call ``await open()`` on startup and ``await close()`` on
+    shutdown (the Teams bot wires these into the aiohttp app lifecycle).
+    """
 
     def __init__(
         self,
@@ -54,67 +140,96 @@ class GenieClient:
     ):
         self.host = host
         self.space_id = space_id
-        self.session = requests.Session()
-        self.session.headers.update({
+        # URL prefixes are fixed per client; only the IDs vary per call.
+        base = f"{host}/api/2.0/genie/spaces/{space_id}"
+        self._start_url = base + "/start-conversation"
+        self._messages_tpl = base + "/conversations/%s/messages"
+        self._message_tpl = self._messages_tpl + "/%s"
+        self._query_result_tpl = self._message_tpl + "/attachments/%s/query-result"
+        self._headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
-        })
+        }
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._attachment_slots = asyncio.Semaphore(ATTACHMENT_CONCURRENCY)
+
+    async def open(self) -> None:
+        """
+        Create the shared HTTP session (must run inside the event loop).
+        Idle connections are kept alive between polls, so an active
+        conversation reuses one TLS connection instead of handshaking on
+        every GET.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self._headers,
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_MAX_CONNECTIONS,
+                    limit_per_host=HTTP_MAX_PER_HOST,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                    # aiodns (aiohttp[speedups]) keeps DNS off the event loop
+                    resolver=aiohttp.AsyncResolver(),
+                ),
+            )
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
-    def ask(self, question: str, conversation_id: Optional[str] = None) -> GenieResult:
+    async def ask(self, question: str, conversation_id: Optional[str] = None) -> GenieResult:
         """
         Send a question to the Genie Space. If conversation_id is provided,
         sends a follow-up message; otherwise starts a new conversation.
         Polls until completion and returns the result.
         """
+        await self.open()
         if conversation_id:
-            return self._follow_up(conversation_id, question)
-        return self._start_conversation(question)
+            return await self._follow_up(conversation_id, question)
+        return await self._start_conversation(question)
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    def _start_conversation(self, question: str) -> GenieResult:
-        url = f"{self.host}/api/2.0/genie/spaces/{self.space_id}/start-conversation"
-        resp = self.session.post(url, json={"content": question})
-        resp.raise_for_status()
-        data = resp.json()
+    async def _start_conversation(self, question: str) -> GenieResult:
+        data = await self._request("POST", self._start_url, json={"content": question})
         conv_id = data.get("conversation_id", "")
         msg_id = data.get("message_id") or data.get("id", "")
-        return self._poll(conv_id, msg_id)
+        return await self._poll(conv_id, msg_id)
 
-    def _follow_up(self, conversation_id: str, question: str) -> GenieResult:
-        url = (
-            f"{self.host}/api/2.0/genie/spaces/{self.space_id}"
-            f"/conversations/{conversation_id}/messages"
-        )
-        resp = self.session.post(url, json={"content": question})
-        resp.raise_for_status()
-        data = resp.json()
+    async def _follow_up(self, conversation_id: str, question: str) -> GenieResult:
+        url = self._messages_tpl % conversation_id
+        data = await self._request("POST", url, json={"content": question})
         msg_id = data.get("id", "")
-        return self._poll(conversation_id, msg_id)
+        return await self._poll(conversation_id, msg_id)
 
-    def _poll(self, conversation_id: str, message_id: str) -> GenieResult:
-        """Poll GET message endpoint with exponential backoff."""
-        url = (
-            f"{self.host}/api/2.0/genie/spaces/{self.space_id}"
-            f"/conversations/{conversation_id}/messages/{message_id}"
-        )
+    async def _poll(self, conversation_id: str, message_id: str) -> GenieResult:
+        """Poll GET message endpoint (long-poll if enabled, else exponential backoff)."""
+        url = self._message_tpl % (conversation_id, message_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + POLL_TIMEOUT
         interval = POLL_INTERVAL_INITIAL
-        elapsed = 0.0
-
-        while elapsed < POLL_TIMEOUT:
-            time.sleep(interval)
-            elapsed += interval
-            resp = self.session.get(url)
-            resp.raise_for_status()
-            data = resp.json()
+        params = {"wait_ms": POLL_WAIT_MS} if POLL_WAIT_MS > 0 else None
+
+        while loop.time() < deadline:
+            if params is None:
+                await asyncio.sleep(interval)
+            started = loop.time()
+            # Transient 429/5xx responses are retried inside _request, so
+            # only real completion states end the loop.
+            data = await self._request("GET", url, params=params)
             status = data.get("status", "")
 
             if status in ("COMPLETED", "FAILED", "CANCELLED"):
-                return self._parse_response(data, conversation_id, message_id)
+                return await self._parse_response(data, conversation_id, message_id)
+
+            if params is not None and loop.time() - started < POLL_WAIT_MS / 2000:
+                logger.info("Genie ignored wait_ms; falling back to polling with backoff")
+                params = None
 
             # exponential backoff
             interval = min(interval * 1.5, POLL_INTERVAL_MAX)
@@ -126,7 +241,7 @@ class GenieClient:
             message_id=message_id,
         )
 
-    def _parse_response(
+    async def _parse_response(
         self, data: dict, conversation_id: str, message_id: str
     ) -> GenieResult:
         status = data.get("status", "UNKNOWN")
@@ -136,6 +251,7 @@ class GenieClient:
         sql_content = None
         columns = []
         rows = []
+        row_count = 0
 
         attachments = data.get("attachments") or []
         for att in attachments:
@@ -144,17 +260,21 @@ class GenieClient:
             if att.get("query"):
                 sql_content = att["query"].get("query", "")
 
-            # If there is a query result attachment, fetch it
-            att_id = att.get("attachment_id")
-            if att_id and status == "COMPLETED":
-                try:
-                    qr = self._get_query_result(
-                        conversation_id, message_id, att_id
-                    )
-                    columns = qr.get("columns", [])
-                    rows = qr.get("rows", [])
-                except Exception as e:
-                    logger.warning(f"Could not fetch query result: {e}")
+        # Fetch all query result attachments concurrently
+        if status == "COMPLETED":
+            att_ids = [att["attachment_id"] for att in attachments if att.get("attachment_id")]
+            results = await asyncio.gather(
+                *(self._get_query_result(conversation_id, message_id, att_id)
+                  for att_id in att_ids),
+                return_exceptions=True,
+            )
+            for att_id, qr in zip(att_ids, results):
+                if isinstance(qr, BaseException):
+                    logger.warning(f"Could not fetch query result for attachment {att_id}: {qr}")
+                    continue
+                columns = qr.get("columns", [])
+                rows = qr.get("rows", [])
+                row_count = qr.get("row_count", len(rows))
 
         return GenieResult(
             status=status,
@@ -162,19 +282,61 @@ class GenieClient:
             sql=sql_content,
             columns=columns,
             rows=rows,
+            row_count=row_count,
             error=str(error) if error else None,
             conversation_id=conversation_id,
             message_id=message_id,
         )
 
-    def _get_query_result(
+    async def _get_query_result(
         self, conversation_id: str, message_id: str, attachment_id: str
     ) -> dict:
-        url = (
-            f"{self.host}/api/2.0/genie/spaces/{self.space_id}"
-            f"/conversations/{conversation_id}/messages/{message_id}"
-            f"/attachments/{attachment_id}/query-result"
-        )
-        resp = self.session.get(url)
-        resp.raise_for_status()
-        return resp.json()
+        url = self._query_result_tpl % (conversation_id, message_id, attachment_id)
+        async with self._attachment_slots:
+            return await self._request("GET", url, read=_read_query_result)
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        read: Optional[Callable[[aiohttp.ClientResponse], Awaitable[dict]]] = None,
+        **kwargs,
+    ) -> dict:
+        """
+        Issue an HTTP call and return its decoded body (``read`` overrides
+        the default orjson decode), retrying transient
+        failures (429/5xx, connection errors) with jittered exponential
+        backoff. A Retry-After header, when present, is a lower bound on
+        the wait. Non-transient errors are raised immediately. POSTs are
+        retried only on 429/503 and connect-phase errors, so a request the
+        server may have processed is never sent twice.
+        """
+        if method == "POST":
+            retry_statuses, retry_errors = RETRY_STATUSES_POST, aiohttp.ClientConnectorError
+        else:
+            retry_statuses, retry_errors = RETRY_STATUSES, aiohttp.ClientConnectionError
+        attempt = 0
+        while True:
+            retry_after = 0.0
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.status not in retry_statuses or attempt >= RETRY_MAX_ATTEMPTS:
+                        resp.raise_for_status()
+                        if read is not None:
+                            return await read(resp)
+                        return orjson.loads(await resp.read())
+                    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                    reason = f"HTTP {resp.status}"
+            except retry_errors as e:
+                if attempt >= RETRY_MAX_ATTEMPTS:
+                    raise
+                reason = str(e) or type(e).__name__
+
+            backoff = min(RETRY_BACKOFF_BASE * 2 ** attempt, RETRY_BACKOFF_MAX)
+            delay = max(retry_after, backoff * random.uniform(0.5, 1.0))
+            attempt += 1
+            logger.warning(
+                f"Genie {method} {url} failed ({reason}); "
+                f"retry {attempt}/{RETRY_MAX_ATTEMPTS} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
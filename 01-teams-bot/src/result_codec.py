@@ -0,0 +1,73 @@
+"""
+result_codec.py — Compact binary encoding for cached GenieResult payloads.
+
+Genie results are small, highly repetitive JSON records (same keys, same
+column metadata, similar SQL), which is the case where zstd with a trained
+dictionary pays off: the dictionary carries the shared structure, so each
+stored entry only encodes what is unique to it.
+
+The dictionary is optional. Without GENIE_ZSTD_DICT pointing at a trained
+file, plain zstd level 3 is used. Train one from captured payloads with:
+
+    python result_codec.py samples.jsonl genie.dict
+
+where each line of samples.jsonl is one GenieResult serialized as JSON.
+"""
+
+import os
+import sys
+import logging
+from dataclasses import asdict
+from typing import Iterable, Optional
+
+import orjson
+import zstandard as zstd
+
+from genie_client import GenieResult
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+ZSTD_DICT_PATH = os.getenv("GENIE_ZSTD_DICT", "genie.dict")
+ZSTD_LEVEL = 3
+ZSTD_DICT_SIZE = 16_384         # bytes
+
+
+def _load_dict(path: str) -> Optional[zstd.ZstdCompressionDict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        logger.info(f"Loaded zstd dictionary from {path}")
+        return zstd.ZstdCompressionDict(f.read())
+
+
+_DICT = _load_dict(ZSTD_DICT_PATH)
+_compressor = zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_DICT)
+_decompressor = zstd.ZstdDecompressor(dict_data=_DICT)
+
+
+def encode_result(result: GenieResult) -> bytes:
+    """Serialize and compress a GenieResult for storage."""
+    return _compressor.compress(orjson.dumps(asdict(result)))
+
+
+def decode_result(blob: bytes) -> GenieResult:
+    """Inverse of encode_result."""
+    return GenieResult(**orjson.loads(_decompressor.decompress(blob)))
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = ZSTD_DICT_SIZE) -> bytes:
+    """Train a zstd dictionary from serialized GenieResult samples."""
+    return zstd.train_dictionary(size, list(samples)).as_bytes()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python result_codec.py <samples.jsonl> <output.dict>")
+    with open(sys.argv[1], "rb") as f:
+        samples = [orjson.dumps(orjson.loads(line)) for line in f if line.strip()]
+    with open(sys.argv[2], "wb") as f:
+        f.write(train_dictionary(samples))
+    print(f"Trained {ZSTD_DICT_SIZE}-byte dictionary from {len(samples)} samples")
@@ -12,6 +12,11 @@
 
 # COMMAND ----------
 
+# MAGIC %pip install orjson
+# MAGIC %restart_python
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Step 1 — Configuration
 
@@ -24,6 +29,10 @@ TABLE = "cpi_world_country_aggregates"
 WAREHOUSE_ID = "5eb73ca40f08c607"                # SQL Warehouse for the dashboard
 GENIE_SPACE_ID = "01f11271f3d41201af68388818cca110"  # Genie Space ID
 
+# Opt-in: liquid-cluster, OPTIMIZE and ANALYZE the source table on the
+# dashboard's filter columns. Only enable it if you own the table.
+OPTIMIZE_SOURCE_TABLE = False
+
 DASHBOARD_NAME = "Acme — CPI World Regional Aggregates"
 DASHBOARD_PARENT_PATH = "/Shared/my-dashboards"
 FQN = f"{CATALOG}.{SCHEMA}.{TABLE}"
@@ -51,20 +60,60 @@ FQN = f"{CATALOG}.{SCHEMA}.{TABLE}"
 
 # COMMAND ----------
 
-import json
+import orjson
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import NotFound
 from databricks.sdk.service.dashboards import Dashboard
 
 w = WorkspaceClient()
 
-# Ensure parent folder exists
+# Ensure parent folder exists (a status lookup is enough on re-runs)
 try:
+    w.workspace.get_status(DASHBOARD_PARENT_PATH)
+except NotFound:
     w.workspace.mkdirs(DASHBOARD_PARENT_PATH)
-except Exception:
-    pass  # already exists
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ### Source table layout (optional)
+# MAGIC
+# MAGIC Every dataset filters on `transformation_type` and most on `country_code`
+# MAGIC and `period`. Clustering on those columns and collecting column statistics
+# MAGIC lets Databricks prune files instead of scanning the whole table per widget.
+# MAGIC
+# MAGIC This step is **opt-in** and skipped by default: it changes the shared
+# MAGIC source table's layout and Delta protocol (liquid clustering is hard to
+# MAGIC undo). Set `OPTIMIZE_SOURCE_TABLE = True` only if you own the table.
+
+# COMMAND ----------
+
+if OPTIMIZE_SOURCE_TABLE:
+    try:
+        spark.sql(f"ALTER TABLE {FQN} CLUSTER BY (transformation_type, country_code, period)")
+        spark.sql(f"OPTIMIZE {FQN}")
+        spark.sql(
+            f"ANALYZE TABLE {FQN} COMPUTE STATISTICS "
+            f"FOR COLUMNS transformation_type, country_code, period, cpi_value"
+        )
+        print(f"✅ {FQN} clustered by (transformation_type, country_code, period)")
+    except Exception as e:
+        print(f"⚠️ Could not optimize {FQN} (continuing without it): {e}")
+
+# COMMAND ----------
+
+# Latest period with data, per transformation type. Shared by the "latest"
+# datasets; the transformation_type filter is pushed into the aggregate, so
+# each query only scans the files for its own type.
+LATEST_PERIODS_CTE = f"""
+    WITH latest_periods AS (
+        SELECT transformation_type, MAX(period) AS max_period
+        FROM {FQN}
+        WHERE cpi_value IS NOT NULL
+        GROUP BY transformation_type
+    )
+"""
+
 # Dashboard definition — Lakeview serialized format
 dashboard_spec = {
     "pages": [
@@ -78,17 +127,14 @@ dashboard_spec = {
         {
             "name": "latest_index_by_region",
             "displayName": "Latest CPI Index by Region",
-            "query": f"""
+            "query": LATEST_PERIODS_CTE + f"""
                 SELECT country_code AS region,
                        period,
                        cpi_value AS cpi_index
                 FROM {FQN}
+                JOIN latest_periods USING (transformation_type)
                 WHERE transformation_type = 'Index'
-                  AND period = (
-                      SELECT MAX(period) FROM {FQN}
-                      WHERE transformation_type = 'Index'
-                        AND cpi_value IS NOT NULL
-                  )
+                  AND period = max_period
                 ORDER BY cpi_value DESC
             """
         },
@@ -126,17 +172,14 @@ dashboard_spec = {
         {
             "name": "top_regions_yoy",
             "displayName": "Top Regions by YoY Inflation (Latest)",
-            "query": f"""
+            "query": LATEST_PERIODS_CTE + f"""
                 SELECT country_code AS region,
                        cpi_value AS yoy_pct_change,
                        period
                 FROM {FQN}
+                JOIN latest_periods USING (transformation_type)
                 WHERE transformation_type = 'Period average, Year-over-year (YOY) percent change'
-                  AND period = (
-                      SELECT MAX(period) FROM {FQN}
-                      WHERE transformation_type = 'Period average, Year-over-year (YOY) percent change'
-                        AND cpi_value IS NOT NULL
-                  )
+                  AND period = max_period
                 ORDER BY cpi_value DESC
             """
         },
@@ -188,29 +231,51 @@ dashboard_spec = {
     ]
 }
 
+SERIALIZED_SPEC = orjson.dumps(dashboard_spec).decode()
+
 print(f"Dashboard specification created with {len(dashboard_spec['datasets'])} datasets")
 
 # COMMAND ----------
 
 # MAGIC %md
-# MAGIC ## Step 3 — Create the Dashboard
+# MAGIC ## Step 3 — Create or Update the Dashboard
 # MAGIC
-# MAGIC Using the Lakeview API. After creation, navigate to the dashboard in the UI
-# MAGIC to arrange widgets visually and publish.
+# MAGIC Using the Lakeview API. If a dashboard with the same name already exists in
+# MAGIC the parent folder, it is updated in place instead of creating a duplicate.
+# MAGIC An update only replaces the datasets: pages and the widget layout you
+# MAGIC arranged in the UI are kept. After creation, navigate to the dashboard in
+# MAGIC the UI to arrange widgets visually and publish.
 
 # COMMAND ----------
 
-dashboard = w.lakeview.create(
-    dashboard=Dashboard(
-        display_name=DASHBOARD_NAME,
-        parent_path=DASHBOARD_PARENT_PATH,
-        warehouse_id=WAREHOUSE_ID,
-        serialized_dashboard=json.dumps(dashboard_spec),
-    )
+dashboard_path = f"{DASHBOARD_PARENT_PATH}/{DASHBOARD_NAME}.lvdash.json"
+try:
+    existing_id = w.workspace.get_status(dashboard_path).resource_id
+except NotFound:
+    existing_id = None
+
+dashboard_def = Dashboard(
+    display_name=DASHBOARD_NAME,
+    parent_path=DASHBOARD_PARENT_PATH,
+    warehouse_id=WAREHOUSE_ID,
+    serialized_dashboard=SERIALIZED_SPEC,
 )
 
+if existing_id:
+    # Start from the live definition so pages[*].layout survives re-runs;
+    # only the datasets come from this notebook.
+    current = orjson.loads(w.lakeview.get(existing_id).serialized_dashboard or "{}")
+    merged = {**current, "datasets": dashboard_spec["datasets"]}
+    merged.setdefault("pages", dashboard_spec["pages"])
+    dashboard_def.serialized_dashboard = orjson.dumps(merged).decode()
+    dashboard = w.lakeview.update(dashboard_id=existing_id, dashboard=dashboard_def)
+    action = "updated"
+else:
+    dashboard = w.lakeview.create(dashboard=dashboard_def)
+    action = "created"
+
 dashboard_url = f"{w.config.host}sql/dashboardsv3/{dashboard.dashboard_id}"
-print(f"✅ Dashboard created: {dashboard_url}")
+print(f"✅ Dashboard {action}: {dashboard_url}")
 print(f"   Dashboard ID: {dashboard.dashboard_id}")
 
 # COMMAND ----------
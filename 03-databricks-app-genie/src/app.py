@@ -12,23 +12,167 @@ environment variables injected by the Databricks Apps runtime.
 """
 
 import os
-import json
-import time
+import asyncio
 import logging
+import warnings
+from typing import TYPE_CHECKING, Callable
+
+import httpx
 import gradio as gr
+from gradio.components.plot import PlotData
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from databricks.sdk import WorkspaceClient
 
-logging.basicConfig(level=logging.INFO)
+from genie_cache import GenieCache
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# Deployed (Databricks Apps / runtime), keep library chatter such as httpx's
+# per-request lines out of the logs; this app's own loggers stay at INFO.
+IN_DATABRICKS = bool(os.getenv("DATABRICKS_APP_NAME") or os.getenv("DATABRICKS_RUNTIME_VERSION"))
+logging.basicConfig(level=logging.WARNING if IN_DATABRICKS else logging.INFO)
 logger = logging.getLogger("my-genie-app")
+logger.setLevel(logging.INFO)
+logging.getLogger("genie_cache").setLevel(logging.INFO)
 
 # ---------------------------------------------------------------------------
 # Databricks SDK — initialized with the app's service principal
 # ---------------------------------------------------------------------------
 w = WorkspaceClient()
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "")
+# Optional Databricks embedding endpoint (e.g. databricks-gte-large-en) that
+# enables the semantic tier of the response cache.
+EMBEDDING_ENDPOINT = os.getenv("EMBEDDING_ENDPOINT", "")
+
+# ---------------------------------------------------------------------------
+# Genie REST client — async, so a slow Genie answer does not pin a Gradio
+# worker thread; many questions can be in flight on one event loop.
+# ---------------------------------------------------------------------------
+GENIE_API = f"/api/2.0/genie/spaces/{GENIE_SPACE_ID}"
+POLL_INTERVAL_INITIAL = 0.25   # seconds
+POLL_INTERVAL_MAX = 2.0        # seconds
+POLL_BACKOFF = 1.6
+POLL_TIMEOUT = 600             # seconds
+GENIE_DONE_STATUSES = {"COMPLETED", "FAILED", "CANCELLED", "QUERY_RESULT_EXPIRED"}
+# Progress shown in the chat while a question is in flight, keyed by Genie
+# message status (plus FETCHING_RESULTS for the query-result download).
+STATUS_LABELS = {
+    "PENDING_WAREHOUSE": "⏳ Waiting for the SQL warehouse…",
+    "EXECUTING_QUERY": "🧮 Running SQL…",
+    "FETCHING_RESULTS": "📥 Fetching results…",
+}
+DEFAULT_STATUS_LABEL = "⏳ Asking Genie…"
+NUMERIC_TYPES = frozenset({"BYTE", "SHORT", "INT", "LONG", "FLOAT", "DOUBLE", "DECIMAL"})
+TEMPORAL_TYPES = frozenset({"DATE", "TIMESTAMP", "TIMESTAMP_NTZ"})
+# Column-name tokens (split on "_") that mark a time axis
+KEYWORDS = frozenset({"period", "year", "month", "date", "time"})
+
+StatusFn = Callable[[str], None]
+
+# One shared HTTP/2 client: concurrent polls from many users multiplex over
+# a few pooled connections instead of opening one each.
+http = httpx.AsyncClient(
+    base_url=w.config.host,
+    timeout=120,
+    http2=True,
+    limits=httpx.Limits(max_connections=64),
+)
+
+
+async def genie_request(method: str, path: str, **kwargs) -> dict:
+    # authenticate() returns fresh headers for whatever auth the SDK resolved
+    # (the app's OAuth service principal in Databricks Apps, a PAT locally).
+    resp = await http.request(method, path, headers=w.config.authenticate(), **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def wait_for_message(conversation_id: str, message_id: str,
+                           on_status: StatusFn | None = None) -> dict:
+    """
+    Poll a Genie message until it reaches a terminal status, backing off
+    from POLL_INTERVAL_INITIAL to POLL_INTERVAL_MAX between polls.
+    """
+    path = f"{GENIE_API}/conversations/{conversation_id}/messages/{message_id}"
+    deadline = asyncio.get_running_loop().time() + POLL_TIMEOUT
+    delay = POLL_INTERVAL_INITIAL
+    last_status = None
+    while True:
+        msg = await genie_request("GET", path)
+        if msg.get("status") in GENIE_DONE_STATUSES:
+            return msg
+        if on_status and msg.get("status") != last_status:
+            last_status = msg.get("status")
+            on_status(last_status)
+        if asyncio.get_running_loop().time() > deadline:
+            raise TimeoutError(f"Genie did not answer within {POLL_TIMEOUT}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_INTERVAL_MAX)
+
+
+def result_dataframe(sr: dict) -> pd.DataFrame | None:
+    """Build a DataFrame from a statement response's inline JSON result."""
+    # One lookup chain on the happy path; a missing or null level means
+    # there is no tabular result (e.g. zero rows omits data_array).
+    try:
+        columns = sr["manifest"]["schema"]["columns"]
+        data_array = sr["result"]["data_array"]
+    except (KeyError, TypeError):
+        return None
+    if not columns or data_array is None:
+        return None
+    col_names = [c["name"] for c in columns]
+    df = pd.DataFrame.from_records(data_array, columns=col_names)
+    # Values arrive as strings; convert the columns the
+    # result schema declares numeric in one pass.
+    numeric = [c["name"] for c in columns if c.get("type_name") in NUMERIC_TYPES]
+    if numeric:
+        df[numeric] = df[numeric].apply(pd.to_numeric, errors="coerce")
+    # Time columns stay as Genie returned them for display; the chart parses
+    # them on its own copy (see chart_json).
+    df.attrs["temporal"] = {c["name"] for c in columns if c.get("type_name") in TEMPORAL_TYPES}
+    return df
+
+
+def parse_time_columns(df: pd.DataFrame, temporal: set = frozenset()) -> pd.DataFrame:
+    """
+    Give time-like columns a datetime64 dtype, in place, so charting can
+    select them by dtype. A column qualifies if the schema types it as a
+    date/timestamp or its name has a KEYWORDS token; it is only converted if
+    every non-null value parses (bare integer years are read as %Y).
+    """
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            continue
+        if col not in temporal and KEYWORDS.isdisjoint(str(col).lower().split("_")):
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)    # per-element parse fallback
+            if pd.api.types.is_numeric_dtype(s):
+                parsed = pd.to_datetime(s, format="%Y", errors="coerce")
+            else:
+                parsed = pd.to_datetime(s, errors="coerce")
+        if parsed.notna().sum() == s.notna().sum():
+            df[col] = parsed
+    return df
+
+
+async def embed_question(text: str) -> list[float]:
+    data = await genie_request(
+        "POST",
+        f"/serving-endpoints/{EMBEDDING_ENDPOINT}/invocations",
+        json={"input": [text]},
+    )
+    return data["data"][0]["embedding"]
+
+
+genie_cache = GenieCache(
+    GENIE_SPACE_ID,
+    embed=embed_question if EMBEDDING_ENDPOINT else None,
+)
 
 # ---------------------------------------------------------------------------
 # Custom CSS — Premium dark theme
@@ -78,14 +222,11 @@ CUSTOM_CSS = """
     font-weight: 600;
 }
 
-/* ── Suggestion chips ── */
-.suggestion-row {
-    display: flex;
+/* ── Suggestion chips (ChatInterface examples) ── */
+.chatbot-container .examples {
     gap: 8px;
-    flex-wrap: wrap;
-    margin-bottom: 12px;
 }
-.suggestion-row button {
+.chatbot-container .example {
     background: linear-gradient(135deg, #1e293b, #0f172a) !important;
     border: 1px solid rgba(56, 189, 248, 0.2) !important;
     color: #cbd5e1 !important;
@@ -95,7 +236,7 @@ CUSTOM_CSS = """
     transition: all 0.2s ease !important;
     cursor: pointer !important;
 }
-.suggestion-row button:hover {
+.chatbot-container .example:hover {
     border-color: #38bdf8 !important;
     color: #f8fafc !important;
     background: linear-gradient(135deg, #1e3a5f, #0f172a) !important;
@@ -166,68 +307,73 @@ CUSTOM_CSS = """
 # Genie interaction helpers
 # ---------------------------------------------------------------------------
 
-def ask_genie(question: str, conversation_id: str = None) -> dict:
+@genie_cache.cached
+async def ask_genie(question: str, conversation_id: str = None,
+                    on_status: StatusFn | None = None) -> dict:
     """
     Send a question to the Genie Space and wait for a response.
-    Returns a dict with: text, sql, dataframe, conversation_id, error.
+    Returns a dict with: text, sql, dataframe, chart, conversation_id, error.
+    ``chart`` is the serialized Plotly JSON for the dataframe, or None.
+    ``on_status`` is called with each new Genie status while polling.
     """
     try:
         if conversation_id:
-            msg = w.genie.create_message_and_wait(
-                space_id=GENIE_SPACE_ID,
-                conversation_id=conversation_id,
-                content=question,
+            started = await genie_request(
+                "POST",
+                f"{GENIE_API}/conversations/{conversation_id}/messages",
+                json={"content": question},
             )
         else:
-            msg = w.genie.start_conversation_and_wait(
-                space_id=GENIE_SPACE_ID,
-                content=question,
+            started = await genie_request(
+                "POST",
+                f"{GENIE_API}/start-conversation",
+                json={"content": question},
             )
+        conv_id = started.get("conversation_id") or conversation_id
+        msg_id = started.get("message_id") or started.get("id")
+        msg = await wait_for_message(conv_id, msg_id, on_status)
 
         result = {
             "text": "",
             "sql": "",
             "dataframe": pd.DataFrame(),
-            "conversation_id": msg.conversation_id,
+            "chart": None,
+            "conversation_id": conv_id,
             "error": None,
         }
 
-        if msg.attachments:
-            for att in msg.attachments:
-                if att.text:
-                    result["text"] = att.text.content or ""
-                if att.query:
-                    result["sql"] = att.query.query or ""
-
-                # Fetch query results if available
-                if getattr(att, 'query', None) and getattr(att, 'attachment_id', None) and msg.status.value == "COMPLETED":
-                    try:
-                        qr = w.genie.get_message_attachment_query_result(
-                            space_id=GENIE_SPACE_ID,
-                            conversation_id=msg.conversation_id,
-                            message_id=msg.id,
-                            attachment_id=att.attachment_id,
-                        )
-                        
-                        # SDK >= 0.40.0 returns a nested StatementResponse under `statement_response`
-                        sr = getattr(qr, 'statement_response', None) or qr
-                        
-                        has_schema = hasattr(sr, 'manifest') and sr.manifest and getattr(sr.manifest, 'schema', None) and getattr(sr.manifest.schema, 'columns', None)
-                        has_data = hasattr(sr, 'result') and sr.result and getattr(sr.result, 'data_array', None) is not None
-                        
-                        if has_schema and has_data:
-                            col_names = [c.name for c in sr.manifest.schema.columns]
-                            df = pd.DataFrame(sr.result.data_array, columns=col_names)
-                            # Try to convert numeric-looking columns
-                            for col in df.columns:
-                                try:
-                                    df[col] = pd.to_numeric(df[col])
-                                except (ValueError, TypeError):
-                                    pass
-                            result["dataframe"] = df
-                    except Exception as e:
-                        logger.warning(f"Could not fetch query result for attachment {att.attachment_id}: {e}")
-
+        if msg.get("status") != "COMPLETED":
+            error = msg.get("error") or {}
+            result["error"] = error.get("error") or f"Genie message {msg.get('status')}"
+
+        for att in msg.get("attachments") or []:
+            if att.get("text"):
+                result["text"] = att["text"].get("content") or ""
+            if att.get("query"):
+                result["sql"] = att["query"].get("query") or ""
+
+            # Fetch query results if available
+            if att.get("query") and att.get("attachment_id") and msg.get("status") == "COMPLETED":
+                try:
+                    if on_status:
+                        on_status("FETCHING_RESULTS")
+                    qr = await genie_request(
+                        "GET",
+                        f"{GENIE_API}/conversations/{conv_id}/messages/{msg_id}"
+                        f"/attachments/{att['attachment_id']}/query-result",
+                    )
+
+                    # The result is nested under `statement_response`
+                    df = result_dataframe(qr.get("statement_response") or qr)
+                    if df is not None:
+                        result["dataframe"] = df
+                except Exception as e:
+                    logger.warning(f"Could not fetch query result for attachment {att['attachment_id']}: {e}")
+
+        # Build the chart once here so the cache stores the ready JSON and
+        # hits skip figure construction and validation entirely. Both are
+        # CPU-bound, so they run off the event loop.
+        result["chart"] = await asyncio.to_thread(chart_json, result["dataframe"])
         return result
 
     except Exception as e:
@@ -236,16 +382,76 @@ def ask_genie(question: str, conversation_id: str = None) -> dict:
             "text": "",
             "sql": "",
             "dataframe": pd.DataFrame(),
+            "chart": None,
             "conversation_id": conversation_id,
             "error": str(e),
         }
 
 
-def auto_chart(df: pd.DataFrame) -> go.Figure | None:
+# Browser rendering cost scales with marker count, so cap what reaches Plotly
+# and the results table.
+MAX_CHART_POINTS = 2000
+MAX_BARS = 50
+MAX_TABLE_ROWS = 500
+
+# Genie questions in flight at once across all users; chat submits and
+# suggestion chips share this limit.
+GENIE_CONCURRENCY = int(os.getenv("GENIE_CONCURRENCY", "8"))
+
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: pick n_out points preserving the shape."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.nan_to_num(y)
+    bucket = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        nxt_end = min(max(int((i + 2) * bucket) + 1, end + 1), n)
+        avg_x, avg_y = x[end:nxt_end].mean(), y[end:nxt_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    idx[-1] = n - 1
+    return idx
+
+
+def downsample_line(df: pd.DataFrame, x_col: str, y_col: str,
+                    color: str | None = None, max_points: int = MAX_CHART_POINTS) -> pd.DataFrame:
+    """LTTB-downsample each series of a line chart to ~max_points in total."""
+    if len(df) <= max_points:
+        return df
+    groups = [g for _, g in df.groupby(color, sort=False)] if color else [df]
+    per_series = max(3, max_points // len(groups))
+    parts = []
+    for g in groups:
+        g = g.sort_values(x_col, kind="stable")
+        x = g[x_col]
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x = x.astype("int64").to_numpy(dtype=float)
+        elif pd.api.types.is_numeric_dtype(x):
+            x = x.to_numpy(dtype=float)
+        else:
+            x = np.arange(len(g), dtype=float)
+        parts.append(g.iloc[_lttb_indices(x, g[y_col].to_numpy(dtype=float), per_series)])
+    return pd.concat(parts)
+
+
+def auto_chart(df: pd.DataFrame) -> "go.Figure | None":
     """Try to create a reasonable Plotly chart from the query results."""
     if df.empty or len(df.columns) < 2:
         return None
 
+    # Imported on first chart: plotly.express loads its schemas eagerly,
+    # which is startup cost the app should not pay before anyone asks.
+    import plotly.express as px
+
     try:
         numeric_cols = df.select_dtypes(include="number").columns.tolist()
         non_numeric_cols = [c for c in df.columns if c not in numeric_cols]
@@ -253,24 +459,33 @@ def auto_chart(df: pd.DataFrame) -> go.Figure | None:
         if not numeric_cols:
             return None
 
-        # If we have a time-like column + numeric → line chart
-        time_cols = [c for c in non_numeric_cols
-                     if any(kw in c.lower() for kw in ["period", "year", "month", "date", "time"])]
+        # If we have a time column (typed at ingestion) + numeric → line chart
+        time_cols = df.select_dtypes(include=["datetime", "datetimetz"]).columns.tolist()
 
         if time_cols and numeric_cols:
             x_col = time_cols[0]
             y_col = numeric_cols[0]
             # If there's a category column, use color
-            cat_cols = [c for c in non_numeric_cols if c != x_col]
+            cat_cols = [c for c in non_numeric_cols if c not in time_cols]
+            # Hand Plotly series already in x order so it has nothing to sort
             if cat_cols and df[cat_cols[0]].nunique() <= 12:
+                df = df.sort_values([cat_cols[0], x_col], kind="stable")
+                df = downsample_line(df, x_col, y_col, color=cat_cols[0])
                 fig = px.line(df, x=x_col, y=y_col, color=cat_cols[0],
                               markers=True)
             else:
+                df = df.sort_values(x_col, kind="stable")
+                df = downsample_line(df, x_col, y_col)
                 fig = px.line(df, x=x_col, y=y_col, markers=True)
-        elif non_numeric_cols and numeric_cols and len(df) <= 20:
-            # Categorical + numeric → bar chart
-            fig = px.bar(df, x=non_numeric_cols[0], y=numeric_cols[0],
-                         color=non_numeric_cols[0] if df[non_numeric_cols[0]].nunique() <= 12 else None)
+        elif non_numeric_cols and numeric_cols:
+            # Categorical + numeric → bar chart, one bar per category (the
+            # sum px.bar would stack anyway), largest MAX_BARS bars
+            x_col, y_col = non_numeric_cols[0], numeric_cols[0]
+            df = df.groupby(x_col, as_index=False, sort=False)[y_col].sum()
+            if len(df) > MAX_BARS:
+                df = df.nlargest(MAX_BARS, y_col)
+            fig = px.bar(df, x=x_col, y=y_col,
+                         color=x_col if len(df) <= 12 else None)
         else:
             return None
 
@@ -299,6 +514,12 @@ def auto_chart(df: pd.DataFrame) -> go.Figure | None:
         return None
 
 
+def chart_json(df: pd.DataFrame) -> str | None:
+    """Serialized Plotly JSON for auto_chart(df), or None. Blocking."""
+    fig = auto_chart(parse_time_columns(df.copy(), df.attrs.get("temporal", frozenset())))
+    return fig.to_json() if fig is not None else None
+
+
 # ---------------------------------------------------------------------------
 # Suggested questions
 # ---------------------------------------------------------------------------
@@ -312,18 +533,68 @@ SUGGESTIONS = [
 
 
 # ---------------------------------------------------------------------------
-# Gradio UI
+# Cache warm-up and prefetch
 # ---------------------------------------------------------------------------
+WARM_CONCURRENCY = 3        # suggestion questions sent to Genie at once
+PREFETCH_MIN_CHARS = 20
+PREFETCH_CONCURRENCY = 2    # embedding prefetches at once, across all users
+
+_warmup: asyncio.Task | None = None
+
+
+async def _warm_suggestions():
+    slots = asyncio.Semaphore(WARM_CONCURRENCY)
+
+    async def warm(suggestion: str):
+        async with slots:
+            await ask_genie(suggestion)
+
+    await asyncio.gather(*(warm(s) for s in SUGGESTIONS))
+    logger.info(f"Warmed the cache for {len(SUGGESTIONS)} suggestions")
 
-def handle_question(question: str, history: list, conv_id: str):
-    """Process user question through Genie and return formatted outputs."""
-    if not question.strip():
-        return history, "", pd.DataFrame(), None, conv_id
 
-    history = history or []
-    history.append({"role": "user", "content": question})
+async def warm_cache():
+    """Answer the suggestion chips once per process so first clicks hit the cache."""
+    global _warmup
+    if _warmup is None:
+        _warmup = asyncio.create_task(_warm_suggestions())
 
-    result = ask_genie(question, conversation_id=conv_id)
+
+async def maybe_prefetch(draft: str, history: list):
+    """Embed a finished draft when the textbox loses focus, for a faster lookup."""
+    # Only opening questions are looked up in the cache
+    if history or len(draft.strip()) < PREFETCH_MIN_CHARS:
+        return
+    await genie_cache.prefetch(draft)
+
+
+# ---------------------------------------------------------------------------
+# Gradio UI
+# ---------------------------------------------------------------------------
+
+async def handle_question(question: str, history: list, conv_id: str):
+    """
+    ChatInterface handler: stream a progress line while Genie works, then
+    the answer. Each yield also carries the SQL, table, chart and
+    conversation ID for the components outside the chat.
+    """
+    if not question.strip():
+        yield "Ask a question about CPI data to get started.", "", pd.DataFrame(), None, conv_id
+        return
+
+    prior_turns = [m["content"] for m in history or [] if m["role"] == "user"]
+    yield DEFAULT_STATUS_LABEL, "", pd.DataFrame(), None, conv_id
+
+    # Status updates arrive on a queue; None marks the answer as ready.
+    updates: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(ask_genie(
+        question, conversation_id=conv_id, prior_turns=prior_turns,
+        on_status=updates.put_nowait,
+    ))
+    task.add_done_callback(lambda _: updates.put_nowait(None))
+    while (status := await updates.get()) is not None:
+        yield STATUS_LABELS.get(status, DEFAULT_STATUS_LABEL), "", pd.DataFrame(), None, conv_id
+    result = task.result()
 
     if result["error"]:
         bot_msg = f"⚠️ **Error:** {result['error']}"
@@ -333,30 +604,26 @@ def handle_question(question: str, history: list, conv_id: str):
             parts.append(result["text"])
         if not result["dataframe"].empty:
             rows = len(result["dataframe"])
-            parts.append(f"\n📊 **{rows} row{'s' if rows != 1 else ''}** returned")
+            shown = f" (showing {MAX_TABLE_ROWS} of {rows} rows)" if rows > MAX_TABLE_ROWS else ""
+            parts.append(f"\n📊 **{rows} row{'s' if rows != 1 else ''}** returned{shown}")
         bot_msg = "\n\n".join(parts) if parts else "Genie returned an empty response."
 
-    history.append({"role": "assistant", "content": bot_msg})
     new_conv_id = result.get("conversation_id") or conv_id
 
-    chart = auto_chart(result.get("dataframe", pd.DataFrame()))
+    df = result.get("dataframe", pd.DataFrame())
+    chart = PlotData(type="plotly", plot=result["chart"]) if result.get("chart") else None
 
-    return (
-        history,
+    yield (
+        bot_msg,
         result.get("sql", ""),
-        result.get("dataframe", pd.DataFrame()),
+        df.head(MAX_TABLE_ROWS),
         chart,
         new_conv_id,
     )
 
 
-def use_suggestion(suggestion: str, history: list, conv_id: str):
-    """Handle suggestion chip click."""
-    return handle_question(suggestion, history, conv_id)
-
-
 def reset_conversation():
-    return [], "", pd.DataFrame(), None, None
+    return [], [], "", pd.DataFrame(), None, None
 
 
 # Build the Gradio interface
@@ -373,6 +640,22 @@ with gr.Blocks(
     # State
     conv_state = gr.State(value=None)
 
+    # Detail components are ChatInterface outputs, so they are created here
+    # and rendered further down, below the chat.
+    chart_output = gr.Plot(label="Visualization", elem_classes="chart-plot", render=False)
+    data_table = gr.Dataframe(
+        label="Query Results",
+        interactive=False,
+        wrap=True,
+        render=False,
+    )
+    sql_output = gr.Code(
+        label="SQL",
+        language="sql",
+        lines=12,
+        render=False,
+    )
+
     # ── Header ──
     gr.HTML("""
     <div class="app-header">
@@ -384,33 +667,35 @@ with gr.Blocks(
     </div>
     """)
 
-    # ── Suggestion chips ──
-    with gr.Row(elem_classes="suggestion-row"):
-        suggestion_btns = []
-        for s in SUGGESTIONS:
-            btn = gr.Button(s, size="sm", variant="secondary")
-            suggestion_btns.append(btn)
-
     # ── Main layout ──
-    # Chat Area
-    chatbot = gr.Chatbot(
-        label="Conversation",
+    # Chat Area — ChatInterface owns the submit/clear-textbox flow and
+    # streams the handler's yields as incremental message updates. The
+    # suggestion chips are its examples: a click runs through the same
+    # submit handler, so chat and chips share one concurrency limit.
+    chat = gr.ChatInterface(
+        fn=handle_question,
         type="messages",
-        height=550,
-        show_copy_button=True,
-        elem_classes="chatbot-container",
-    )
-    with gr.Row():
-        question_input = gr.Textbox(
+        chatbot=gr.Chatbot(
+            label="Conversation",
+            type="messages",
+            height=550,
+            show_copy_button=True,
+            elem_classes="chatbot-container",
+        ),
+        textbox=gr.Textbox(
             placeholder="Ask a question about CPI data...",
-            label="Your question",
-            scale=5,
             container=False,
-        )
-        send_btn = gr.Button(
-            "Ask Genie ✨", variant="primary", scale=1,
-            elem_classes="primary-btn",
-        )
+            scale=7,
+            submit_btn="Ask Genie ✨",
+        ),
+        additional_inputs=[conv_state],
+        additional_outputs=[sql_output, data_table, chart_output, conv_state],
+        examples=[[s, None] for s in SUGGESTIONS],
+        run_examples_on_click=True,
+        cache_examples=False,
+        concurrency_limit=GENIE_CONCURRENCY,
+    )
+    with gr.Row():
         reset_btn = gr.Button(
             "🗑️ Clear", scale=1,
             elem_classes="reset-btn",
@@ -420,52 +705,39 @@ with gr.Blocks(
     with gr.Accordion("🔍 View Analysis Details (SQL, Data & Charts)", open=False, elem_classes="details-accordion"):
         with gr.Tabs():
             with gr.TabItem("📈 Visualization"):
-                chart_output = gr.Plot(label="Visualization", elem_classes="chart-plot")
+                chart_output.render()
             with gr.TabItem("📋 Query Results"):
-                data_table = gr.Dataframe(
-                    label="Query Results",
-                    interactive=False,
-                    wrap=True,
-                )
+                data_table.render()
             with gr.TabItem("📝 Generated SQL"):
-                sql_output = gr.Code(
-                    label="SQL",
-                    language="sql",
-                    lines=12,
-                )
+                sql_output.render()
 
     # ── Event handlers ──
-    outputs = [chatbot, sql_output, data_table, chart_output, conv_state]
-
-    send_btn.click(
-        fn=handle_question,
-        inputs=[question_input, chatbot, conv_state],
-        outputs=outputs,
-        api_name=False,
-    ).then(fn=lambda: "", outputs=question_input)
+    # Prefetch only matters with a semantic cache. It fires on blur, i.e. on
+    # a settled draft rather than per keystroke, and has its own small pool
+    # so it never takes queue slots from real submits.
+    if genie_cache.embed is not None:
+        chat.textbox.blur(
+            fn=maybe_prefetch,
+            inputs=[chat.textbox, chat.chatbot_state],
+            api_name=False,
+            show_progress="hidden",
+            concurrency_limit=PREFETCH_CONCURRENCY,
+            concurrency_id="prefetch",
+        )
 
-    question_input.submit(
-        fn=handle_question,
-        inputs=[question_input, chatbot, conv_state],
-        outputs=outputs,
-        api_name=False,
-    ).then(fn=lambda: "", outputs=question_input)
+    app.load(fn=warm_cache, api_name=False, concurrency_limit=None)
 
-    reset_btn.click(
+    # Cleanups are unlimited so they never wait behind a slow answer. The
+    # chatbot's own clear button also drops the Genie conversation, so a chip
+    # clicked on the emptied chat starts a new one.
+    gr.on(
+        triggers=[reset_btn.click, chat.chatbot.clear],
         fn=reset_conversation,
-        outputs=outputs,
+        outputs=[chat.chatbot, chat.chatbot_state, sql_output, data_table, chart_output, conv_state],
         api_name=False,
+        concurrency_limit=None,
     )
 
-    # Wire suggestion buttons
-    for btn in suggestion_btns:
-        btn.click(
-            fn=use_suggestion,
-            inputs=[btn, chatbot, conv_state],
-            outputs=outputs,
-            api_name=False,
-        )
-
     # ── Footer ──
     gr.HTML("""
     <div style="text-align: center; padding: 16px 0 4px; color: #475569; font-size: 0.78rem;">
@@ -474,8 +746,13 @@ with gr.Blocks(
     """)
 
 
+# Async handlers only hold a queue slot, not a thread, while Genie works,
+# so the queue can be deep and the thread pool (sync helpers only) small.
+app.queue(default_concurrency_limit=32, max_size=256)
+
 if __name__ == "__main__":
     app.launch(
         server_name="0.0.0.0",
         server_port=int(os.getenv("PORT", "8080")),
+        max_threads=16,
     )
@@ -0,0 +1,231 @@
+"""
+genie_cache.py — Two-tier response cache for Genie answers.
+
+Only opening questions are cached (see GenieCache.cached): a follow-up's
+answer belongs to its Genie conversation and always goes to Genie.
+
+Tier 1 (exact): the key is a SHA-256 over the space ID, the conversation's
+earlier user turns (none, for the cached decorator) and the normalized
+question, so a repeated opening question (e.g. a suggestion chip clicked by
+many users) is answered from disk without calling Genie.
+
+Tier 2 (semantic, optional): when an embedding function is supplied, each
+cached question is embedded and a miss on tier 1 falls back to a cosine
+similarity search over earlier questions with the same prior turns. A match
+at or above SIMILARITY_THRESHOLD returns that answer. The index is a flat
+in-memory matrix per conversation prefix (brute force is exact and fast at
+the scale of one app's question history) persisted alongside the entries.
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Awaitable, Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from diskcache import Cache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+CACHE_DIR = os.getenv("GENIE_CACHE_DIR", "/tmp/genie_cache")
+CACHE_TTL = int(os.getenv("GENIE_CACHE_TTL", "3600"))     # seconds
+SIMILARITY_THRESHOLD = float(os.getenv("GENIE_CACHE_SIMILARITY", "0.92"))
+MAX_INDEX_SIZE = 10_000         # most recent questions kept per prefix
+EMBED_MEMO_SIZE = 1_024         # recent question embeddings kept in memory
+
+EmbedFn = Callable[[str], Awaitable[Sequence[float]]]
+
+
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+class GenieCache:
+    """Exact + semantic cache in front of an async ``ask_genie`` function."""
+
+    def __init__(
+        self,
+        space_id: str,
+        directory: str = CACHE_DIR,
+        embed: Optional[EmbedFn] = None,
+        ttl: int = CACHE_TTL,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ):
+        self.space_id = space_id
+        self.store = Cache(directory)
+        self.embed = embed
+        self.ttl = ttl
+        self.threshold = threshold
+        # prefix hash → (unit-norm embedding matrix, entry keys)
+        self._index: dict[str, tuple[np.ndarray, list[str]]] = {}
+        # normalized question → unit-norm embedding, LRU-bounded
+        self._embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+    def _prefix(self, prior_turns: Sequence[str]) -> str:
+        raw = self.space_id + "|" + "|".join(normalize(t) for t in prior_turns)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _key(self, prefix: str, question: str) -> str:
+        return hashlib.sha256(f"{prefix}|{normalize(question)}".encode()).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Semantic index
+    # ------------------------------------------------------------------
+    def _load_index(self, prefix: str) -> tuple[np.ndarray, list[str]]:
+        if prefix not in self._index:
+            self._index[prefix] = self.store.get(("index", prefix)) or (np.empty((0, 0)), [])
+        return self._index[prefix]
+
+    async def _embed(self, question: str) -> Optional[np.ndarray]:
+        text = normalize(question)
+        if text in self._embeddings:
+            self._embeddings.move_to_end(text)
+            return self._embeddings[text]
+        try:
+            vec = np.asarray(await self.embed(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding failed, semantic cache skipped: {e}")
+            return None
+        vec = vec / (np.linalg.norm(vec) or 1.0)
+        self._embeddings[text] = vec
+        if len(self._embeddings) > EMBED_MEMO_SIZE:
+            self._embeddings.popitem(last=False)
+        return vec
+
+    async def prefetch(self, question: str) -> None:
+        """Embed a draft question ahead of time so its lookup skips the call."""
+        if self.embed is not None:
+            await self._embed(question)
+
+    async def _nearest(self, prefix: str, question: str) -> Optional[str]:
+        matrix, keys = self._load_index(prefix)
+        if not keys:
+            return None
+        vec = await self._embed(question)
+        if vec is None or vec.shape[0] != matrix.shape[1]:
+            return None
+        scores = matrix @ vec
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            logger.info(f"Semantic cache hit (similarity {scores[best]:.3f})")
+            return keys[best]
+        return None
+
+    async def _add_to_index(self, prefix: str, key: str, question: str) -> None:
+        vec = await self._embed(question)
+        if vec is None:
+            return
+        matrix, keys = self._load_index(prefix)
+        if keys and matrix.shape[1] != vec.shape[0]:
+            matrix, keys = np.empty((0, 0)), []
+        matrix = np.vstack([matrix, vec]) if keys else vec[None, :]
+        self._index[prefix] = (matrix[-MAX_INDEX_SIZE:], (keys + [key])[-MAX_INDEX_SIZE:])
+        await asyncio.to_thread(self.store.set, ("index", prefix), self._index[prefix])
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _pack(result: dict) -> dict:
+        df = result["dataframe"]
+        parquet = None
+        if not df.empty:
+            buf = io.BytesIO()
+            df.to_parquet(buf, index=False)
+            parquet = buf.getvalue()
+        return {
+            "text": result["text"],
+            "sql": result["sql"],
+            "dataframe_parquet": parquet,
+            "chart": result.get("chart"),
+        }
+
+    @staticmethod
+    def _unpack(entry: dict) -> dict:
+        parquet = entry["dataframe_parquet"]
+        return {
+            "text": entry["text"],
+            "sql": entry["sql"],
+            "dataframe": pd.read_parquet(io.BytesIO(parquet)) if parquet else pd.DataFrame(),
+            "chart": entry.get("chart"),
+            "conversation_id": None,
+            "error": None,
+        }
+
+    # Parquet encoding and sqlite I/O block, so the async methods below run
+    # them on a worker thread instead of the event loop.
+    def _read(self, key: str) -> Optional[dict]:
+        entry = self.store.get(key)
+        return self._unpack(entry) if entry is not None else None
+
+    def _write(self, key: str, result: dict) -> None:
+        self.store.set(key, self._pack(result), expire=self.ttl)
+
+    async def lookup(self, question: str, prior_turns: Sequence[str] = ()) -> Optional[dict]:
+        prefix = self._prefix(prior_turns)
+        hit = await asyncio.to_thread(self._read, self._key(prefix, question))
+        if hit is None and self.embed is not None:
+            near_key = await self._nearest(prefix, question)
+            hit = await asyncio.to_thread(self._read, near_key) if near_key else None
+        return hit
+
+    async def save(self, question: str, prior_turns: Sequence[str], result: dict) -> None:
+        if result.get("error"):
+            return
+        prefix = self._prefix(prior_turns)
+        key = self._key(prefix, question)
+        await asyncio.to_thread(self._write, key, result)
+        if self.embed is not None:
+            await self._add_to_index(prefix, key, question)
+
+    # ------------------------------------------------------------------
+    # Decorator
+    # ------------------------------------------------------------------
+    def cached(self, ask: Callable[..., Awaitable[dict]]):
+        """
+        Wrap ``ask(question, conversation_id, **kwargs)`` with the cache. The
+        wrapper takes an extra ``prior_turns`` argument: the earlier user
+        questions in the conversation, which scope the cache key. Other
+        keyword arguments are passed through to ``ask`` on a miss.
+
+        Only opening questions (no prior turns, no conversation) are served
+        from or stored in the cache. A follow-up's answer depends on the
+        Genie conversation it belongs to, and a cached reply would leave that
+        conversation without the turn, so follow-ups always go to Genie.
+        Entries never carry the original asker's conversation: an opening
+        question answered from the cache gets none, so the caller's next
+        message starts its own.
+        """
+        @wraps(ask)
+        async def wrapper(question: str, conversation_id: str = None,
+                          prior_turns: Sequence[str] = (), **kwargs) -> dict:
+            if prior_turns or conversation_id:
+                return await ask(question, conversation_id, **kwargs)
+
+            try:
+                hit = await self.lookup(question, prior_turns)
+            except Exception as e:
+                logger.warning(f"Cache lookup failed: {e}")
+                hit = None
+            if hit is not None:
+                return hit
+
+            result = await ask(question, conversation_id, **kwargs)
+            try:
+                await self.save(question, prior_turns, result)
+            except Exception as e:
+                logger.warning(f"Cache write failed: {e}")
+            return result
+
+        return wrapper
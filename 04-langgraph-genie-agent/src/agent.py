@@ -10,9 +10,15 @@ This agent uses:
 The agent is designed to be logged with mlflow.pyfunc.log_model() and served
 on Databricks Model Serving, where it can be consumed by any downstream app
 (Databricks App, Teams bot, Slack bot, etc.).
+
+Nothing is built at import time: the LLM client, the Genie tool and the
+compiled graph are created on first use by the cached ``get_*`` factories,
+so importing this module needs no credentials and a serving replica pays
+the construction cost once, in ``load_context``.
 """
 
 import os
+from functools import lru_cache
 from typing import Optional, Sequence, Union
 
 from langchain_core.language_models import LanguageModelLike
@@ -34,33 +40,41 @@ import mlflow
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "01f11271f3d41201af68388818cca110")
 LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "databricks-meta-llama-3-3-70b-instruct")
 
+GENIE_DESCRIPTION = (
+    "Specializes in analyzing Consumer Price Index (CPI) data across world "
+    "countries. Use this tool for questions about CPI values, trends, "
+    "comparisons between countries, year-over-year changes, rankings, "
+    "and any structured data query about inflation indicators. "
+    "The underlying data covers CPI World Country Aggregates with columns: "
+    "country_name, country_code, indicator_name, year, value."
+)
+
 # ---------------------------------------------------------------------------
 # LLM
 # ---------------------------------------------------------------------------
-llm = ChatDatabricks(
-    endpoint=LLM_ENDPOINT,
-    temperature=0.0,
-    max_tokens=2048,
-)
+@lru_cache(maxsize=1)
+def get_llm() -> ChatDatabricks:
+    return ChatDatabricks(
+        endpoint=LLM_ENDPOINT,
+        temperature=0.0,
+        max_tokens=2048,
+    )
 
 # ---------------------------------------------------------------------------
 # Genie Agent as a Tool
 # ---------------------------------------------------------------------------
-genie_agent = GenieAgent(
-    genie_space_id=GENIE_SPACE_ID,
-    genie_agent_name="CPI_Data_Analyst",
-    description=(
-        "Specializes in analyzing Consumer Price Index (CPI) data across world "
-        "countries. Use this tool for questions about CPI values, trends, "
-        "comparisons between countries, year-over-year changes, rankings, "
-        "and any structured data query about inflation indicators. "
-        "The underlying data covers CPI World Country Aggregates with columns: "
-        "country_name, country_code, indicator_name, year, value."
-    ),
-)
+@lru_cache(maxsize=1)
+def get_genie_agent() -> GenieAgent:
+    return GenieAgent(
+        genie_space_id=GENIE_SPACE_ID,
+        genie_agent_name="CPI_Data_Analyst",
+        description=GENIE_DESCRIPTION,
+    )
+
 
-# Additional tools can be added here (e.g., VectorSearchRetrieverTool for unstructured data)
-tools = [genie_agent]
+def get_tools() -> list:
+    # Additional tools can be added here (e.g., VectorSearchRetrieverTool for unstructured data)
+    return [get_genie_agent()]
 
 # ---------------------------------------------------------------------------
 # LangGraph Agent Builder
@@ -126,11 +140,29 @@ Key data characteristics:
 # ---------------------------------------------------------------------------
 # Build the agent
 # ---------------------------------------------------------------------------
-agent = create_tool_calling_agent(
-    model=llm,
-    tools=tools,
-    agent_prompt=SYSTEM_PROMPT,
-)
+@lru_cache(maxsize=1)
+def get_agent() -> CompiledGraph:
+    return create_tool_calling_agent(
+        model=get_llm(),
+        tools=get_tools(),
+        agent_prompt=SYSTEM_PROMPT,
+    )
+
+
+class GenieAgentModel(mlflow.pyfunc.PythonModel):
+    """Pyfunc wrapper that compiles the agent once per serving replica."""
+
+    def load_context(self, context):
+        get_agent()
+
+    def predict(self, context, model_input, params=None):
+        # Serving may hand over a one-row DataFrame instead of the raw dict
+        if hasattr(model_input, "to_dict"):
+            model_input = model_input.to_dict(orient="records")[0]
+        return get_agent().invoke(model_input)
+
 
 # Enable MLflow tracing
 mlflow.langchain.autolog()
+
+mlflow.models.set_model(GenieAgentModel())
@@ -37,10 +37,10 @@ os.environ["LLM_ENDPOINT"] = LLM_ENDPOINT
 
 # COMMAND ----------
 
-from agent import agent
+from agent import get_agent
 
-# Quick test
-test_result = agent.invoke(
+# Quick test — the first call builds the LLM client, Genie tool and graph
+test_result = get_agent().invoke(
     {"messages": [{"role": "user", "content": "What is the CPI for Bermuda in the most recent year?"}]}
 )
 for msg in test_result["messages"]:
@@ -17,18 +17,35 @@
 import os
 import json
 import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
 
 # COMMAND ----------
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+logger = logging.getLogger("genie-benchmark")
+
 # Configuration
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "01f11271f3d41201af68388818cca110")
 CATALOG = os.getenv("CATALOG", "my_catalog")
 SCHEMA = os.getenv("SCHEMA", "genie_ready")
 RESULTS_TABLE = f"{CATALOG}.{SCHEMA}.genie_benchmark_results"
-
-w = WorkspaceClient()
+GENIE_CONCURRENCY = 5   # questions in flight at once
+HTTP_POOL_SIZE = 32     # keep-alive connections; > GENIE_CONCURRENCY
+
+# One client shared by every worker thread. The SDK mounts its own HTTPAdapter
+# (and retries 429/5xx itself); size its pool so no worker opens a new TLS
+# connection per call.
+w = WorkspaceClient(config=Config(
+    max_connection_pools=HTTP_POOL_SIZE,
+    max_connections_per_pool=HTTP_POOL_SIZE,
+))
+# Authenticate and open a connection once, up front, so worker threads start
+# with a resolved token instead of racing to fetch it on their first call
+w.current_user.me()
 run_timestamp = datetime.utcnow().isoformat()
 
 # COMMAND ----------
@@ -46,12 +63,16 @@ print(f"Results → {RESULTS_TABLE}")
 
 # COMMAND ----------
 
-results = []
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split())
 
-for bq in BENCHMARK_QUESTIONS:
-    print(f"\n{'='*60}")
-    print(f"[{bq['id']}] {bq['question']}")
 
+def run_one(bq) -> dict:
+    """
+    Ask Genie one benchmark question and return the answer fields of its
+    result row. Always a fresh call: unlike the report job there is no
+    response cache here, since the point is to measure Genie's current answers.
+    """
     start_time = time.time()
     status = "UNKNOWN"
     genie_sql = ""
@@ -60,10 +81,11 @@ for bq in BENCHMARK_QUESTIONS:
     has_results = False
 
     try:
-        # Ask Genie
+        # Ask Genie — a new conversation per question, so earlier questions
+        # cannot influence the answer being scored
         msg = w.genie.start_conversation_and_wait(
             space_id=GENIE_SPACE_ID,
-            content=bq["question"],
+            content=bq.question,
         )
         elapsed = time.time() - start_time
         status = msg.status.value if msg.status else "UNKNOWN"
@@ -77,28 +99,49 @@ for bq in BENCHMARK_QUESTIONS:
                 if att.attachment_id:
                     has_results = True
 
-        print(f"  Status: {status} | Time: {elapsed:.1f}s")
-        if genie_sql:
-            print(f"  SQL: {genie_sql[:120]}...")
-
     except Exception as e:
         elapsed = time.time() - start_time
         status = "ERROR"
         error_msg = str(e)
-        print(f"  ERROR: {error_msg}")
 
-    results.append({
-        "run_timestamp": run_timestamp,
-        "question_id": bq["id"],
-        "question": bq["question"],
-        "category": bq["category"],
+    # One record per question, so parallel workers never interleave output
+    if error_msg:
+        logger.warning("q=%s status=%s elapsed=%.2fs error=%s", bq.id, status, elapsed, error_msg)
+    else:
+        logger.info("q=%s status=%s elapsed=%.2fs sql=%.120s", bq.id, status, elapsed, genie_sql)
+
+    return {
         "status": status,
         "genie_sql": genie_sql,
-        "genie_text": genie_text[:1000],  # truncate
+        "genie_text": genie_text,
         "has_query_results": has_results,
         "response_time_seconds": round(elapsed, 2),
         "error": error_msg,
-    })
+    }
+
+
+# Questions are independent and each call just waits on Genie, so threads
+# overlap them; the bound keeps us within the space's concurrent-query limit.
+# A question repeated in the suite (same text after normalizing case and
+# whitespace) is asked once and its answer shared by every row that has it.
+unique = {normalize(bq.question): bq for bq in BENCHMARK_QUESTIONS}
+answers = {}
+
+with ThreadPoolExecutor(max_workers=min(GENIE_CONCURRENCY, len(unique))) as pool:
+    futures = {pool.submit(run_one, bq): key for key, bq in unique.items()}
+    for future in as_completed(futures):
+        answers[futures[future]] = future.result()
+
+results = [
+    {
+        "run_timestamp": run_timestamp,
+        "question_id": bq.id,
+        "question": bq.question,
+        "category": bq.category,
+        **answers[normalize(bq.question)],
+    }
+    for bq in BENCHMARK_QUESTIONS
+]
 
 # COMMAND ----------
 
@@ -107,13 +150,36 @@ for bq in BENCHMARK_QUESTIONS:
 
 # COMMAND ----------
 
-import pandas as pd
-
-df = pd.DataFrame(results)
-spark_df = spark.createDataFrame(df)
-
-# Create table if not exists, then append
-spark_df.write.mode("append").option("mergeSchema", "true").saveAsTable(RESULTS_TABLE)
+from pyspark.sql import functions as F
+from pyspark.sql.types import BooleanType, DoubleType, StringType, StructField, StructType
+
+# Explicit schema: no inference, and all-empty columns still get a type.
+# run_timestamp stays an ISO string to match existing tables and the summary.
+RESULTS_SCHEMA = StructType([
+    StructField("run_timestamp", StringType()),
+    StructField("question_id", StringType()),
+    StructField("question", StringType()),
+    StructField("category", StringType()),
+    StructField("status", StringType()),
+    StructField("genie_sql", StringType()),
+    StructField("genie_text", StringType()),
+    StructField("has_query_results", BooleanType()),
+    StructField("response_time_seconds", DoubleType()),
+    StructField("error", StringType()),
+])
+MAX_TEXT_CHARS = 1000   # cap on stored free-text columns
+
+results_df = spark.createDataFrame(results, schema=RESULTS_SCHEMA)
+for col in ("genie_sql", "genie_text", "error"):
+    results_df = results_df.withColumn(col, F.substring(col, 1, MAX_TEXT_CHARS))
+
+# Create table if not exists, then append. Schema merge is only requested
+# when RESULTS_SCHEMA has gained a column the existing table lacks.
+writer = results_df.write.mode("append")
+if spark.catalog.tableExists(RESULTS_TABLE) and \
+        not set(RESULTS_SCHEMA.fieldNames()) <= set(spark.table(RESULTS_TABLE).columns):
+    writer = writer.option("mergeSchema", "true")
+writer.saveAsTable(RESULTS_TABLE)
 
 print(f"\n✅ {len(results)} benchmark results written to {RESULTS_TABLE}")
 
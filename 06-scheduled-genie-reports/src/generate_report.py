@@ -19,19 +19,49 @@
 import os
 import time
 import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
+from databricks.sdk.service.dashboards import MessageStatus
+from jinja2 import Template
 
 # COMMAND ----------
 
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+logger = logging.getLogger("genie-report")
+
 # Configuration
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "01f11271f3d41201af68388818cca110")
 CATALOG = os.getenv("CATALOG", "my_catalog")
 SCHEMA = os.getenv("SCHEMA", "genie_ready")
 VOLUME = "reports"
 VOLUME_PATH = f"/Volumes/{CATALOG}/{SCHEMA}/{VOLUME}"
-
-w = WorkspaceClient()
+SOURCE_TABLE = f"{CATALOG}.{SCHEMA}.cpi_world_country_aggregates"
+CACHE_TABLE = f"{CATALOG}.{SCHEMA}.genie_cache"
+USE_CACHE = True    # reuse answers while the source table is unchanged
+# By default each section opens its own conversation, so sections run in
+# parallel and every question is answered on its own. Set True to ask them
+# all in one conversation instead: later answers may then read earlier ones
+# as context, and since Genie answers one message per conversation at a
+# time, sections run in order.
+SHARED_CONVERSATION = False
+GENIE_CONCURRENCY = 5   # sections in flight at once when not shared
+HTTP_POOL_SIZE = 32     # keep-alive connections; sections × attachments
+
+# One client shared by every worker thread. The SDK mounts its own HTTPAdapter
+# (and retries 429/5xx itself); size its pool so no worker opens a new TLS
+# connection per call.
+w = WorkspaceClient(config=Config(
+    max_connection_pools=HTTP_POOL_SIZE,
+    max_connections_per_pool=HTTP_POOL_SIZE,
+))
+# Authenticate and open a connection once, up front, so worker threads start
+# with a resolved token instead of racing to fetch it on their first call
+w.current_user.me()
 report_date = datetime.utcnow().strftime("%Y-%m-%d")
 
 # COMMAND ----------
@@ -74,75 +104,267 @@ REPORT_QUESTIONS = [
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Response Cache
+# MAGIC
+# MAGIC Answers are cached in a Delta table keyed on the Genie Space, the
+# MAGIC normalized question and the source table's Delta version. Until the
+# MAGIC data changes, a re-run reuses last week's section instead of asking
+# MAGIC Genie again; any write to the source table invalidates every entry.
+
+# COMMAND ----------
+
+spark.sql(f"""
+    CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+        question_hash STRING,
+        question STRING,
+        response_text STRING,
+        sql STRING,
+        table_html STRING,
+        created_at TIMESTAMP,
+        source_version STRING
+    )
+""")
+
+
+def normalize(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(f"{GENIE_SPACE_ID}|{normalize(question)}".encode()).hexdigest()
+
+
+source_version = str(spark.sql(f"DESCRIBE HISTORY {SOURCE_TABLE} LIMIT 1").first()["version"])
+
+# Read every hit up front so worker threads only do dict lookups
+cache_hits = {}
+if USE_CACHE:
+    wanted = {question_hash(rq["question"]) for rq in REPORT_QUESTIONS}
+    cache_hits = {
+        row["question_hash"]: row
+        for row in spark.sql(
+            f"""
+            SELECT question_hash, response_text, sql, table_html
+            FROM {CACHE_TABLE}
+            WHERE source_version = :source_version
+            """,
+            args={"source_version": source_version},
+        ).collect()
+        if row["question_hash"] in wanted
+    }
+print(f"Cache: {len(cache_hits)}/{len(REPORT_QUESTIONS)} sections reusable at source version {source_version}")
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Query Genie for Each Section
 
 # COMMAND ----------
 
-sections = []
+# Result table, compiled once; autoescape keeps cell values from being read as HTML
+ROW_TPL = Template(
+    "<table><thead><tr>{% for c in cols %}<th>{{ c }}</th>{% endfor %}</tr></thead>"
+    "<tbody>{% for r in rows %}<tr>{% for v in r %}<td>{{ v }}</td>{% endfor %}</tr>{% endfor %}</tbody></table>",
+    autoescape=True,
+)
+
+# Questions whose answer is a fixed query are run directly on Spark instead of
+# being sent to Genie. Keyed on question_hash, so the wording must match up to
+# case and whitespace. "text" is filled from the first result row. If the
+# query fails or returns nothing, the section falls back to Genie.
+CANNED_SQL = {
+    question_hash("How many countries and years are covered in the dataset?"): {
+        "sql": (
+            f"SELECT COUNT(DISTINCT country_code) AS regions, COUNT(DISTINCT year) AS years, "
+            f"MIN(period) AS first_period, MAX(period) AS last_period FROM {SOURCE_TABLE} "
+            "WHERE cpi_value IS NOT NULL"
+        ),
+        "text": "The dataset covers {regions} regions over {years} years, "
+                "from {first_period} to {last_period}.",
+    },
+    question_hash("Compare the CPI of Bermuda, United States, United Kingdom, and Canada for the last 5 available years"): {
+        "sql": (
+            f"SELECT year, country_code, ROUND(AVG(cpi_value), 2) AS avg_cpi_index FROM {SOURCE_TABLE} "
+            "WHERE transformation_type = 'Index' "
+            "AND country_code IN ('Bermuda', 'United States', 'United Kingdom', 'Canada') "
+            f"AND year > (SELECT MAX(year) - 5 FROM {SOURCE_TABLE} "
+            "WHERE transformation_type = 'Index' AND cpi_value IS NOT NULL) "
+            "GROUP BY year, country_code ORDER BY year DESC, country_code"
+        ),
+        "text": "Average CPI index per year for the peer group, starting {year}.",
+    },
+}
 
-for rq in REPORT_QUESTIONS:
-    print(f"\n📊 Section: {rq['section']}")
-    print(f"   Question: {rq['question']}")
 
+def canned_section(rq: dict, canned: dict):
+    """Answer a section from its canned query, or None to fall back to Genie."""
     try:
-        msg = w.genie.start_conversation_and_wait(
+        result_df = spark.sql(canned["sql"])
+        rows = result_df.limit(50).collect()
+    except Exception as e:
+        logger.warning("section=%r canned query failed, asking Genie: %s", rq["section"], e)
+        return None
+    if not rows:
+        logger.warning("section=%r canned query returned no rows, asking Genie", rq["section"])
+        return None
+    logger.info("section=%r status=CANNED", rq["section"])
+    return {
+        "title": rq["section"],
+        "question": rq["question"],
+        "text": canned["text"].format(**rows[0].asDict()),
+        "sql": canned["sql"],
+        "table_html": ROW_TPL.render(cols=result_df.columns, rows=rows),
+        "status": "OK",
+        "cacheable": False,    # re-run each time, cheap
+    }
+
+
+conversation_id = None     # the shared conversation, opened by the first question
+
+
+def ask_genie(question: str):
+    """Ask a question, continuing the shared conversation when enabled."""
+    global conversation_id
+    if SHARED_CONVERSATION and conversation_id:
+        return w.genie.create_message_and_wait(
             space_id=GENIE_SPACE_ID,
-            content=rq["question"],
+            conversation_id=conversation_id,
+            content=question,
         )
+    msg = w.genie.start_conversation_and_wait(
+        space_id=GENIE_SPACE_ID,
+        content=question,
+    )
+    if SHARED_CONVERSATION:
+        conversation_id = msg.conversation_id
+    return msg
+
+
+def fetch_table(msg, att):
+    """Return (table HTML, None) for an attachment's query result, or ("", error)."""
+    try:
+        stmt = w.genie.get_message_attachment_query_result(
+            space_id=GENIE_SPACE_ID,
+            conversation_id=msg.conversation_id,
+            message_id=msg.id,
+            attachment_id=att.attachment_id,
+        ).statement_response
+        schema = stmt.manifest.schema if stmt.manifest else None
+        data = stmt.result.data_array if stmt.result else None
+        if not (schema and schema.columns and data):
+            return "", None
+        rows = islice(data, 50)  # limit rows, no copy
+        return ROW_TPL.render(cols=[c.name for c in schema.columns], rows=rows), None
+    except Exception as e:
+        return "", e
+
+
+def build_section(rq: dict) -> dict:
+    """Ask Genie one report question and return the rendered section data."""
+    key = question_hash(rq["question"])
+    hit = cache_hits.get(key)
+    if hit is not None:
+        logger.info("section=%r status=CACHED", rq["section"])
+        return {
+            "title": rq["section"],
+            "question": rq["question"],
+            "text": hit["response_text"],
+            "sql": hit["sql"],
+            "table_html": hit["table_html"],
+            "status": "OK",
+            "cacheable": False,    # already in the cache
+        }
+
+    canned = CANNED_SQL.get(key)
+    section = canned_section(rq, canned) if canned is not None else None
+    if section is not None:
+        return section
+
+    try:
+        msg = ask_genie(rq["question"])
 
         text_response = ""
         sql_response = ""
         table_html = ""
 
-        if msg.attachments:
-            for att in msg.attachments:
-                if att.text:
-                    text_response = att.text.content or ""
-                if att.query:
-                    sql_response = att.query.query or ""
-
-                # Fetch query results for table rendering
-                if att.attachment_id:
-                    try:
-                        qr = w.genie.get_message_attachment_query_result(
-                            space_id=GENIE_SPACE_ID,
-                            conversation_id=msg.conversation_id,
-                            message_id=msg.id,
-                            attachment_id=att.attachment_id,
-                        )
-                        if qr.columns and qr.data_array:
-                            col_names = [c.name for c in qr.columns]
-                            rows = qr.data_array[:50]  # limit rows
-                            # Build HTML table
-                            header = "".join(f"<th>{c}</th>" for c in col_names)
-                            body = ""
-                            for row in rows:
-                                body += "<tr>" + "".join(f"<td>{v}</td>" for v in row) + "</tr>"
-                            table_html = f"<table><thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
-                    except Exception as e:
-                        print(f"   ⚠️ Could not fetch results: {e}")
-
-        sections.append({
+        attachments = msg.attachments or []
+        for att in attachments:
+            if att.text:
+                text_response = att.text.content or ""
+            if att.query:
+                sql_response = att.query.query or ""
+
+        # Fetch and render query results; independent calls, so several
+        # attachments are fetched side by side. A failing attachment only
+        # loses its own table.
+        with_results = [att for att in attachments if att.attachment_id]
+        if len(with_results) > 1:
+            with ThreadPoolExecutor(max_workers=len(with_results)) as pool:
+                fetched = list(pool.map(lambda att: fetch_table(msg, att), with_results))
+        else:
+            fetched = [fetch_table(msg, att) for att in with_results]
+
+        fetch_errors = [error for _, error in fetched if error is not None]
+        for html, _ in fetched:
+            if html:
+                table_html = html
+
+        section = {
             "title": rq["section"],
             "question": rq["question"],
             "text": text_response,
             "sql": sql_response,
             "table_html": table_html,
             "status": "OK",
-        })
-        print(f"   ✅ Done")
+            # Only complete answers are replayed; a FAILED/CANCELLED message
+            # or a missing table is retried on the next run
+            "cacheable": msg.status == MessageStatus.COMPLETED and not fetch_errors,
+        }
+        if fetch_errors:
+            logger.warning("section=%r status=OK fetch_errors=%s", rq["section"], fetch_errors)
+        else:
+            logger.info("section=%r status=OK", rq["section"])
 
     except Exception as e:
-        sections.append({
+        section = {
             "title": rq["section"],
             "question": rq["question"],
             "text": "",
             "sql": "",
             "table_html": "",
             "status": f"Error: {e}",
-        })
-        print(f"   ❌ Error: {e}")
+            "cacheable": False,
+        }
+        logger.warning("section=%r status=ERROR error=%s", rq["section"], e)
+
+    return section
+
+
+# Sections are blocking SDK calls, so run them on threads (one at a time in a
+# shared conversation); map() returns them in REPORT_QUESTIONS order.
+# databricks-sdk has no async client, and wrapping its sync calls in asyncio
+# would only move them onto a thread pool anyway, so threads it is.
+# A question listed under more than one section is asked once.
+unique = {normalize(rq["question"]): rq for rq in REPORT_QUESTIONS}
+
+with ThreadPoolExecutor(max_workers=1 if SHARED_CONVERSATION else min(GENIE_CONCURRENCY, len(unique))) as pool:
+    answers = dict(zip(unique, pool.map(build_section, unique.values())))
+
+sections = [
+    {**answers[normalize(rq["question"])], "title": rq["section"], "question": rq["question"]}
+    for rq in REPORT_QUESTIONS
+]
+
+# Store fresh complete answers in one append
+fresh = [
+    (question_hash(s["question"]), s["question"], s["text"], s["sql"],
+     s["table_html"], datetime.utcnow(), source_version)
+    for s in answers.values() if s["cacheable"]
+]
+if USE_CACHE and fresh:
+    spark.createDataFrame(fresh, spark.table(CACHE_TABLE).schema) \
+        .write.mode("append").saveAsTable(CACHE_TABLE)
 
 # COMMAND ----------
 
@@ -151,8 +373,6 @@ for rq in REPORT_QUESTIONS:
 
 # COMMAND ----------
 
-from jinja2 import Template
-
 REPORT_TEMPLATE = Template("""
 <!DOCTYPE html>
 <html>
@@ -180,25 +400,26 @@ REPORT_TEMPLATE = Template("""
 <h1>🏛️ Acme CPI Weekly Report</h1>
 <p><strong>Date:</strong> {{ report_date }} | <strong>Source:</strong> Databricks Genie Space</p>
 
-{% for section in sections %}
+{% for section in ok %}
 <h2>{{ section.title }}</h2>
 <p class="question">📝 {{ section.question }}</p>
-
-{% if section.status == 'OK' %}
-  {% if section.text %}
-  <div class="response">{{ section.text }}</div>
-  {% endif %}
-  {% if section.table_html %}
-  {{ section.table_html }}
-  {% endif %}
-  {% if section.sql %}
-  <details><summary>View SQL</summary><div class="sql">{{ section.sql }}</div></details>
-  {% endif %}
-{% else %}
-  <p class="error">{{ section.status }}</p>
+{% if section.text %}
+<div class="response">{{ section.text }}</div>
+{% endif %}
+{% if section.table_html %}
+{{ section.table_html }}
+{% endif %}
+{% if section.sql %}
+<details><summary>View SQL</summary><div class="sql">{{ section.sql }}</div></details>
 {% endif %}
 {% endfor %}
 
+{% for section in errs %}
+<h2>{{ section.title }}</h2>
+<p class="question">📝 {{ section.question }}</p>
+<p class="error">{{ section.status }}</p>
+{% endfor %}
+
 <div class="footer">
   Generated automatically by the Acme Genie Scheduled Reports job.<br>
   Powered by Databricks AI/BI Genie Space.
@@ -207,11 +428,6 @@ REPORT_TEMPLATE = Template("""
 </html>
 """)
 
-html_report = REPORT_TEMPLATE.render(
-    report_date=report_date,
-    sections=sections,
-)
-
 # COMMAND ----------
 
 # MAGIC %md
@@ -222,11 +438,18 @@ html_report = REPORT_TEMPLATE.render(
 report_filename = f"my_cpi_report_{report_date}.html"
 report_path = f"{VOLUME_PATH}/{report_filename}"
 
-dbutils.fs.put(report_path.replace("/Volumes/", "dbfs:/Volumes/"), html_report, overwrite=True)
+# Answered sections first, failures grouped after them
+ok = [s for s in sections if s["status"] == "OK"]
+errs = [s for s in sections if s["status"] != "OK"]
+
+# Stream the render straight into the Volume file instead of building the
+# whole document in memory first
+with open(report_path, "w", encoding="utf-8") as f:
+    REPORT_TEMPLATE.stream(report_date=report_date, ok=ok, errs=errs).dump(f)
 
 print(f"✅ Report saved to: {report_path}")
 print(f"   Sections: {len(sections)}")
-print(f"   Successful: {sum(1 for s in sections if s['status'] == 'OK')}")
+print(f"   Successful: {len(ok)}")
 
 # COMMAND ----------
 
@@ -235,4 +458,5 @@ print(f"   Successful: {sum(1 for s in sections if s['status'] == 'OK')}")
 
 # COMMAND ----------
 
-displayHTML(html_report)
+with open(report_path, encoding="utf-8") as f:
+    displayHTML(f.read())